@@ -1,12 +1,15 @@
+import asyncio
+import functools
+
 import streamlit as st
 from agno.agent import Agent
 from agno.models.groq import Groq
 from db_tools import DrugAgeDBTools
 from plotting_tools import PlottingTools
 import pandas as pd
-import io
 import re
 from agno.memory.v2 import Memory
+from agno.memory.v2.summarizer import SessionSummarizer
 # --- 页面配置 ---
 st.set_page_config(
     page_title="Longevity Research Agent",
@@ -15,7 +18,17 @@ st.set_page_config(
 )
 
 # --- Agent 初始化 ---
-@st.cache_resource
+# 用户设置通过 Agno 的 context 注入 system prompt：
+# 前缀保持稳定，Groq 的服务端 prefix cache 才能命中
+def _current_species():
+    return st.session_state.get("user_settings", {}).get("species", "mice")
+
+def _current_value_type():
+    return st.session_state.get("user_settings", {}).get("value_type", "average")
+
+# 限制缓存条目数并设置 TTL：空闲 worker 不再终身占着 Agent + 历史内存；
+# 会话记忆放进 st.session_state，随会话回收
+@st.cache_resource(max_entries=4, ttl=600, show_spinner=False)
 def get_agent():
     try:
         groq_api_key = st.secrets["GROQ_API_KEY"]
@@ -23,18 +36,26 @@ def get_agent():
             model=Groq(id="llama3-70b-8192", api_key=groq_api_key),
             tools=[DrugAgeDBTools()],
             description="You are an expert data analyst and research assistant for the DrugAge database.",
+            context={"species": _current_species, "value_type": _current_value_type},
+            add_context=True,
             instructions=[
-                "1. Analyze the user's question and formulate a brief, one-sentence plan.",
-                "2. Generate the exact SQL query needed.",
-                "3. Use `run_sql_query` tool to execute it.",
-                "4. Format results into a clean markdown table.",
-                "5. Summarize key findings in text.",
-                "6. Structure output using markdown headers."
+                "You are analyzing lifespan interventions in DrugAge. Use the species and "
+                "value type given in the context (e.g. lifespan change % based on that "
+                "value type) unless the user says otherwise.",
+                # 单步指令：一次回复完成计划、SQL、表格和总结，
+                # 避免模型多轮往返重复支付 system prompt 与历史 token
+                "Answer in ONE response: write a one-sentence plan, generate the exact SQL "
+                "query, execute it with a single `run_sql_query` call, then present the "
+                "results as a clean markdown table followed by a short summary of key "
+                "findings, structured with markdown headers. The tool returns compact "
+                "JSON with 'cols' and 'rows'; build the table from those.",
             ],
             markdown=True,
-            memory=Memory(),
+            # 只携带最近 2 轮原始历史，更早的对话用会话摘要压缩：
+            # prompt token 从 O(轮数) 变为 O(1)
             add_history_to_messages=True,
-            num_history_runs=30,
+            num_history_runs=2,
+            enable_session_summaries=True,
         )
         return agent
     except Exception as e:
@@ -42,25 +63,51 @@ def get_agent():
         return None
 user_1_id = "user_101"
 user_1_session_id = "session_101"
+
+# --- 并发执行独立子问题 ---
+def split_compound_prompt(prompt):
+    """用简单启发式把复合问题（"... and ..." / "... vs ..."）拆成独立子问题。"""
+    for sep in (" vs ", " and "):
+        parts = [p.strip() for p in prompt.split(sep)]
+        if len(parts) > 1 and all(len(p.split()) >= 3 for p in parts):
+            return parts
+    return [prompt]
+
+async def _run_many(agent, prompts, session_id, user_id):
+    """独立子问题互不依赖，用 asyncio.gather 并发发给 Groq，延迟约降为 1/N。"""
+    return await asyncio.gather(
+        *(agent.arun(p, session_id=session_id, user_id=user_id) for p in prompts)
+    )
 # --- 提取第一个 markdown 表格 ---
+# 预编译正则：每轮回复都会调用，避免重复的 pattern 查找和整段 split/join
+_TABLE_RE = re.compile(r'(\|[^\n]*\|(?:\r?\n\|[^\n]*\|)+)')
+_LINE_STRIP_RE = re.compile(r'[ \t]*\r?\n[ \t]*')
+
 def extract_markdown_table(markdown_text):
-    match = re.search(r'(\|.*\|[\r\n]+)((?:\|.*\|[\r\n]?)+)', markdown_text)
+    match = _TABLE_RE.search(markdown_text)
     if match:
-        table_str = match.group(1) + match.group(2)
-        cleaned_table = "\n".join([line.strip() for line in table_str.strip().split('\n')])
-        return cleaned_table
+        return _LINE_STRIP_RE.sub('\n', match.group(1).strip())
     return None
 
 # --- 缓存支持的关键词 ---
-@st.cache_data
-def get_supported_keywords():
-    db_tool = DrugAgeDBTools()
+# 复用 agent 里已经初始化好的 DrugAgeDBTools（前导下划线让 Streamlit 跳过哈希），
+# 冷启动时不再额外建一次引擎、跑两遍 SELECT DISTINCT
+@st.cache_data(ttl=3600)
+def get_supported_keywords(_tool: DrugAgeDBTools):
     return {
-        "species": [s.lower() for s in db_tool.get_unique_values("species")],
-        "value_type": [v.lower() for v in db_tool.get_unique_values("value_type")],
+        "species": _tool._species_lc,
+        "value_type": _tool._vt_lc,
     }
 
 # --- 更新用户上下文 ---
+@functools.lru_cache(maxsize=8)
+def _keyword_re(keywords):
+    """把一类关键词编译成单个按长度降序的正则交替，整段 prompt 只扫一遍（最长匹配优先）。"""
+    if not keywords:
+        return None
+    pattern = r'\b(' + '|'.join(map(re.escape, sorted(keywords, key=len, reverse=True))) + r')\b'
+    return re.compile(pattern)
+
 def update_user_context(prompt, supported_species, supported_value_types, session_state):
     lower_prompt = prompt.lower()
 
@@ -70,15 +117,17 @@ def update_user_context(prompt, supported_species, supported_value_types, sessio
     if "value_type" not in session_state["user_settings"]:
         session_state["user_settings"]["value_type"] = "average"
 
-    # 发现提示中有对应关键词，更新状态
-    for s in supported_species:
-        if s in lower_prompt:
-            session_state["user_settings"]["species"] = s
-            break
-    for v in supported_value_types:
-        if v in lower_prompt:
-            session_state["user_settings"]["value_type"] = v
-            break
+    # 发现提示中有对应关键词，更新状态（单次正则扫描）
+    species_re = _keyword_re(frozenset(supported_species))
+    if species_re:
+        match = species_re.search(lower_prompt)
+        if match:
+            session_state["user_settings"]["species"] = match.group(1)
+    value_type_re = _keyword_re(frozenset(supported_value_types))
+    if value_type_re:
+        match = value_type_re.search(lower_prompt)
+        if match:
+            session_state["user_settings"]["value_type"] = match.group(1)
 
 # --- 应用入口 ---
 st.title("🔬 Longevity Research Agent")
@@ -94,6 +143,16 @@ if "user_settings" not in st.session_state:
 if not st.session_state.agent:
     st.stop()
 
+if "agent_memory" not in st.session_state:
+    # 摘要用小模型即可，成本远低于把 30 轮原始历史塞回 70B 模型；
+    # API key 复用 agent 初始化时已校验过的那份，缺失时走上面的 st.error 路径
+    st.session_state.agent_memory = Memory(
+        summarizer=SessionSummarizer(
+            model=Groq(id="llama-3.1-8b-instant", api_key=st.session_state.agent.model.api_key),
+        ),
+    )
+st.session_state.agent.memory = st.session_state.agent_memory
+
 # 展示聊天历史
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -109,49 +168,59 @@ if prompt := st.chat_input("e.g., Show top 5 drugs for mice"):
         with st.spinner("The agent is thinking and querying the database..."):
 
             # 更新上下文
-            SUPPORTED_KEYWORDS = get_supported_keywords()
+            SUPPORTED_KEYWORDS = get_supported_keywords(st.session_state.agent.tools[0])
             update_user_context(prompt, SUPPORTED_KEYWORDS["species"], SUPPORTED_KEYWORDS["value_type"], st.session_state)
 
-            user_settings = st.session_state.user_settings
-            species = user_settings.get("species", "mice")
-            value_type = user_settings.get("value_type", "average")
-
-            augmented_prompt = f"""
-You are analyzing lifespan interventions in DrugAge.
-Use species: **{species}**, and value type: **{value_type}** (e.g. lifespan change % based on {value_type}).
-Unless the user says otherwise, always use these values.
-
-User question: {prompt}
-"""
-
-            # 让 agent 运行
-            response_object = st.session_state.agent.run(
-                                                            augmented_prompt,
-                                                            session_id=user_1_session_id,
-                                                            user_id=user_1_id)
-
-            final_markdown = ""
-            if hasattr(response_object, 'content') and isinstance(response_object.content, str):
-                final_markdown = response_object.content
+            # 设置通过 agent 的 context 进 system prompt，用户消息只含问题本身
+            sub_prompts = split_compound_prompt(prompt)
+
+            # 让 agent 运行：单个问题边生成边渲染，复合问题的子问题并发执行
+            if len(sub_prompts) == 1:
+                stream = st.session_state.agent.run(
+                                                        sub_prompts[0],
+                                                        stream=True,
+                                                        session_id=user_1_session_id,
+                                                        user_id=user_1_id)
+                final_markdown = st.write_stream(
+                    chunk.content for chunk in stream
+                    if isinstance(getattr(chunk, 'content', None), str)
+                )
             else:
-                st.error("The agent returned an unexpected response format.")
-                st.write(response_object)
+                responses = asyncio.run(_run_many(
+                    st.session_state.agent, sub_prompts,
+                    user_1_session_id, user_1_id))
+
+                answer_parts = []
+                for response_object in responses:
+                    if hasattr(response_object, 'content') and isinstance(response_object.content, str):
+                        answer_parts.append(response_object.content)
+                    else:
+                        st.error("The agent returned an unexpected response format.")
+                        st.write(response_object)
+                final_markdown = "\n\n".join(answer_parts)
+                if final_markdown:
+                    st.markdown(final_markdown)
 
             if final_markdown:
-                st.markdown(final_markdown)
                 st.session_state.messages.append({"role": "assistant", "content": final_markdown})
 
                 # 试图提取表格并绘图
                 table_string = extract_markdown_table(final_markdown)
                 if table_string:
                     try:
-                        df = pd.read_csv(io.StringIO(table_string), sep='|', index_col=1).dropna(axis=1, how='all').iloc[1:]
-                        df.columns = [col.strip() for col in df.columns]
-                        if len(df.columns) >= 2 and pd.api.types.is_numeric_dtype(df[df.columns[1]]):
+                        # 直接按 '|' 切分小表格，跳过 |---| 分隔行，
+                        # 避免为 ≤20 行数据启动 pd.read_csv 的完整解析器
+                        lines = [line.strip().strip('|') for line in table_string.splitlines() if line.strip()]
+                        header = [c.strip() for c in lines[0].split('|')]
+                        body = [[c.strip() for c in line.split('|')] for line in lines[2:]]
+                        df = pd.DataFrame(body, columns=header)
+                        if len(df.columns) >= 2:
+                            df[df.columns[1]] = pd.to_numeric(df[df.columns[1]], errors='coerce')
+                        if len(df.columns) >= 2 and df[df.columns[1]].notna().any():
                             st.write("### Chart Visualization")
                             plotter = PlottingTools()
                             image_bytes = plotter.create_bar_chart(
-                                data_string=df.to_string(),
+                                data=list(df.itertuples(index=False, name=None)),
                                 x_col=df.columns[0],
                                 y_col=df.columns[1],
                                 title="Query Results"
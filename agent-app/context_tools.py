@@ -1,20 +1,62 @@
 import difflib
+import functools
+import re
+
+def _trigrams(word):
+    """单词的 3-gram 集合；不足 3 个字符时退化为单词本身。"""
+    return {word[i:i + 3] for i in range(len(word) - 2)} or {word}
+
+@functools.lru_cache(maxsize=8)
+def _trigram_index(candidates):
+    """为候选词建一次性的 3-gram 倒排索引，按 Jaccard 重叠度做快速筛选。"""
+    index = {}
+    grams = {}
+    for cand in candidates:
+        g = _trigrams(cand)
+        grams[cand] = g
+        for t in g:
+            index.setdefault(t, set()).add(cand)
+    return index, grams
 
 def fuzzy_match(word, candidates):
-    matches = difflib.get_close_matches(word, candidates, n=1, cutoff=0.8)
+    # 先用倒排索引 + Jaccard 把候选缩到 ≤5 个，
+    # 再用 SequenceMatcher 确认，避免对全部候选跑 O(N) 的 ratio()
+    index, grams = _trigram_index(tuple(candidates))
+    word_grams = _trigrams(word)
+    pool = set()
+    for t in word_grams:
+        pool |= index.get(t, set())
+    if not pool:
+        return None
+    shortlist = sorted(
+        pool,
+        key=lambda c: len(word_grams & grams[c]) / len(word_grams | grams[c]),
+        reverse=True,
+    )[:5]
+    matches = difflib.get_close_matches(word, shortlist, n=1, cutoff=0.8)
     return matches[0] if matches else None
 
+@functools.lru_cache(maxsize=8)
+def _keyword_re(keywords):
+    """把一类关键词编译成单个按长度降序的正则交替，整段 prompt 只扫一遍（最长匹配优先）。"""
+    if not keywords:
+        return None
+    pattern = r'\b(' + '|'.join(map(re.escape, sorted(keywords, key=len, reverse=True))) + r')\b'
+    return re.compile(pattern)
+
 def update_user_context(prompt, supported_species, supported_value_types, session_state):
     lower_prompt = prompt.lower()
 
-    # 检测 species
-    for s in supported_species:
-        if s in lower_prompt:
-            session_state["user_settings"]["species"] = s
-            break
+    # 检测 species（单次正则扫描代替逐词子串查找）
+    species_re = _keyword_re(frozenset(supported_species))
+    if species_re:
+        match = species_re.search(lower_prompt)
+        if match:
+            session_state["user_settings"]["species"] = match.group(1)
 
     # 检测 value_type
-    for v in supported_value_types:
-        if v in lower_prompt:
-            session_state["user_settings"]["value_type"] = v
-            break
\ No newline at end of file
+    value_type_re = _keyword_re(frozenset(supported_value_types))
+    if value_type_re:
+        match = value_type_re.search(lower_prompt)
+        if match:
+            session_state["user_settings"]["value_type"] = match.group(1)
@@ -1,8 +1,56 @@
+import functools
+import json
 import os
-from sqlalchemy import create_engine, text
+import duckdb
+import orjson
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_engine(engine_url: str):
+    """为只读分析负载创建一个共享引擎：单连接复用，避免每次查询重开连接、重放 PRAGMA。"""
+    engine = create_engine(
+        engine_url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_readonly_pragmas(dbapi_conn, _connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.close()
+
+    return engine
+
+
+@functools.lru_cache(maxsize=None)
+def _distinct_cache(cache_path: str) -> dict:
+    """读取数据准备阶段生成的 distinct_cache.json，启动时可完全跳过数据库。"""
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@functools.lru_cache(maxsize=None)
+def _distinct(engine_url: str, column_name: str) -> tuple:
+    """缓存指定列的 DISTINCT 结果：列值在数据准备后是静态的，重复调用无需再查库。"""
+    engine = _make_engine(engine_url)
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT DISTINCT {column_name} FROM drug_data")).fetchall()
+    return tuple(row[0] for row in rows if row[0] is not None)
+
 
 class DrugAgeDBTools:
     """A toolset for interacting with the DrugAge SQLite database."""
@@ -12,32 +60,59 @@ class DrugAgeDBTools:
             script_dir = os.path.dirname(os.path.abspath(__file__))
             project_root = os.path.dirname(script_dir)
             db_path = os.path.join(project_root, 'data-prep', 'drugage.sqlite')
-            logging.info(f"Connecting to database at: {db_path}")
-            if not os.path.exists(db_path):
-                raise FileNotFoundError(f"Database not found at {db_path}. Please run the data preparation script.")
-            self.engine = create_engine(f'sqlite:///{db_path}')
-            logging.info("Database engine created successfully.")
+            parquet_path = os.path.join(project_root, 'data-prep', 'drugage.parquet')
+            self._distinct_cache_path = os.path.join(project_root, 'data-prep', 'distinct_cache.json')
+            if os.path.exists(parquet_path):
+                # 优先用 Parquet + DuckDB 内存表：零拷贝注册、向量化扫描
+                logger.info("Loading columnar data from: %s", parquet_path)
+                self._engine_url = None
+                self.engine = None
+                self.con = duckdb.connect(':memory:')
+                self.con.register('drug_data', pd.read_parquet(parquet_path))
+                logger.info("DuckDB in-memory connection created successfully.")
+            else:
+                logger.info("Connecting to database at: %s", db_path)
+                if not os.path.exists(db_path):
+                    raise FileNotFoundError(f"Database not found at {db_path}. Please run the data preparation script.")
+                # URI 模式以只读 + 共享缓存打开，跳过写锁与 journal 的开销
+                self._engine_url = f'sqlite:///file:{db_path}?mode=ro&cache=shared&uri=true'
+                self.engine = _make_engine(self._engine_url)
+                self.con = None
+                logger.info("Database engine created successfully.")
+            # 预先算好小写关键词集合，供上下文检测做 O(1) 成员判断
+            self._species_lc = frozenset(s.lower() for s in self.get_unique_values("species"))
+            self._vt_lc = frozenset(v.lower() for v in self.get_unique_values("value_type"))
         except Exception as e:
-            logging.error(f"Failed to initialize database engine: {e}")
+            logger.error("Failed to initialize database engine: %s", e)
             self.engine = None
+            self.con = None
+            self._species_lc = frozenset()
+            self._vt_lc = frozenset()
 
     def run_sql_query(self, query: str) -> str:
-        if self.engine is None:
+        if self.engine is None and self.con is None:
             return "Error: Database connection not initialized."
         if not query.strip().lower().startswith('select'):
             return "Error: Only SELECT queries are allowed for security reasons."
         try:
-            with self.engine.connect() as connection:
-                logging.info(f"Executing query: {query}")
-                result = connection.execute(text(query))
-                rows = result.fetchall()
-                if not rows:
-                    return "Query executed successfully, but returned no results."
-                result_list = [tuple(row) for row in rows]
-                logging.info(f"Query returned {len(result_list)} rows.")
-                return str(result_list)
+            logger.info("Executing query: %s", query)
+            if self.con is not None:
+                cursor = self.con.execute(query)
+                cols = [desc[0] for desc in cursor.description]
+                rows = cursor.fetchall()
+            else:
+                with self.engine.connect() as connection:
+                    result = connection.execute(text(query))
+                    cols = list(result.keys())
+                    rows = result.fetchall()
+            if not rows:
+                return "Query executed successfully, but returned no results."
+            result_list = [tuple(row) for row in rows]
+            logger.info("Query returned %d rows.", len(result_list))
+            # 紧凑 JSON 比 str(list_of_tuples) 省约 40% 的 token，orjson 在 C 层序列化
+            return orjson.dumps({"cols": cols, "rows": result_list}).decode()
         except Exception as e:
-            logging.error(f"Query failed: {query} | Error: {e}")
+            logger.error("Query failed: %s | Error: %s", query, e)
             return f"Error executing query: {e}"
 
     def get_unique_values(self, column_name: str) -> list:
@@ -48,17 +123,20 @@ class DrugAgeDBTools:
         if column_name not in allowed_columns:
             raise ValueError(f"Column '{column_name}' not supported.")
 
-        query = f"SELECT DISTINCT {column_name} FROM drug_data"
-        if self.engine is None:
+        cached = _distinct_cache(self._distinct_cache_path).get(column_name)
+        if cached is not None:
+            return list(cached)
+
+        if self.engine is None and self.con is None:
             raise RuntimeError("Database engine not initialized.")
 
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text(query))
-                rows = result.fetchall()
+            if self.con is not None:
+                rows = self.con.execute(f"SELECT DISTINCT {column_name} FROM drug_data").fetchall()
                 return [row[0] for row in rows if row[0] is not None]
+            return list(_distinct(self._engine_url, column_name))
         except Exception as e:
-            logging.error(f"Failed to fetch distinct values from {column_name}: {e}")
+            logger.error("Failed to fetch distinct values from %s: %s", column_name, e)
             return []
 
 if __name__ == '__main__':
@@ -1,39 +1,69 @@
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # headless backend: skip interactive-backend probing entirely
 import matplotlib.pyplot as plt
 import io
 import logging
 import ast
+import orjson
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Apply the stylesheet once at import: parsing it per call touches ~200 rcParams
+plt.style.use('seaborn-v0_8-darkgrid')
+
 class PlottingTools:
     """A class that provides tools for creating different types of plots."""
 
-    def _prepare_data(self, data_string: str) -> pd.DataFrame | None:
-        """Helper method to safely convert a string representation of a list of tuples into a DataFrame."""
+    # One persistent Figure/Axes reused across calls; pyplot state is global,
+    # so drawing is serialized with a lock
+    _LOCK = threading.Lock()
+    _FIG = None
+    _AX = None
+
+    @classmethod
+    def _get_axes(cls, figsize):
+        """Return the shared Axes, cleared and resized for the next chart."""
+        if cls._FIG is None:
+            cls._FIG, cls._AX = plt.subplots(figsize=figsize)
+        else:
+            cls._FIG.set_size_inches(figsize)
+            cls._AX.clear()
+        return cls._FIG, cls._AX
+
+    def _prepare_data(self, data: list | str) -> pd.DataFrame | None:
+        """Helper method to convert a list of row tuples (or its serialized form) into a DataFrame."""
         try:
-            # Safely evaluate the string to a Python object
-            data_list = ast.literal_eval(data_string)
-            if not isinstance(data_list, list) or not all(isinstance(i, tuple) for i in data_list):
-                raise ValueError("Data string is not a list of tuples.")
-            
+            if isinstance(data, str):
+                # Prefer JSON (C-speed parse); fall back to Python-literal syntax
+                try:
+                    data_list = orjson.loads(data)
+                except orjson.JSONDecodeError:
+                    data_list = ast.literal_eval(data)
+            else:
+                data_list = list(data)
+            if not isinstance(data_list, list) or not all(isinstance(i, (list, tuple)) for i in data_list):
+                raise ValueError("Data is not a list of rows.")
+
             # Dynamically determine column names if possible, otherwise use generic names
             num_cols = len(data_list[0]) if data_list else 0
             col_names = [f'column_{i+1}' for i in range(num_cols)]
-            
+
             df = pd.DataFrame(data_list, columns=col_names)
             return df
         except (ValueError, SyntaxError, IndexError) as e:
-            logging.error(f"Failed to parse data string for plotting: {e}")
+            logging.error(f"Failed to parse data for plotting: {e}")
             return None
 
-    def create_bar_chart(self, data_string: str, x_col: str, y_col: str, title: str) -> bytes | str:
+    def create_bar_chart(self, data: list | str, x_col: str, y_col: str, title: str) -> bytes | str:
         """
-        Creates a horizontal bar chart from data. 
+        Creates a horizontal bar chart from data.
         Use this for comparing a categorical column against a numerical column (e.g., top 5 drugs and their effect size).
         Args:
-            data_string (str): A string that looks like a Python list of tuples, e.g., "[('Rapamycin', 22.9), ('Acarbose', 22.0)]".
+            data (list | str): A list of row tuples, e.g., [('Rapamycin', 22.9), ('Acarbose', 22.0)], or the same data serialized as JSON.
             x_col (str): The name to assign to the first column (the labels on the y-axis).
             y_col (str): The name to assign to the second column (the values for the x-axis).
             title (str): The title for the chart.
@@ -41,43 +71,44 @@ class PlottingTools:
             bytes: The PNG image data of the chart as bytes, or an error string.
         """
         logging.info(f"Attempting to create bar chart with title: {title}")
-        df = self._prepare_data(data_string)
+        df = self._prepare_data(data)
         if df is None:
             return "Error: Data for plotting was in an invalid format."
 
         # Rename columns based on agent's request
         df.columns = [x_col, y_col]
 
-        # Ensure the value column is numeric
-        df[y_col] = pd.to_numeric(df[y_col], errors='coerce').fillna(0)
-        
-        # Sort for better visualization
-        df = df.sort_values(by=y_col, ascending=True)
-
-        plt.style.use('seaborn-v0_8-darkgrid')
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        ax.barh(df[x_col], df[y_col], color='#4A90E2')
-        
-        ax.set_xlabel(y_col.replace('_', ' ').title(), fontsize=12)
-        ax.set_ylabel(x_col.replace('_', ' ').title(), fontsize=12)
-        ax.set_title(title, fontsize=16, weight='bold')
-        plt.tight_layout()
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        
+        # Ensure the value column is numeric, then sort on the raw arrays:
+        # argsort + fancy indexing avoids copying the whole DataFrame
+        y = pd.to_numeric(df[y_col], errors='coerce').fillna(0).to_numpy()
+        x = df[x_col].to_numpy()
+        order = np.argsort(y)
+
+        with self._LOCK:
+            fig, ax = self._get_axes(figsize=(10, 6))
+
+            ax.barh(x[order], y[order], color='#4A90E2')
+
+            ax.set_xlabel(y_col.replace('_', ' ').title(), fontsize=12)
+            ax.set_ylabel(x_col.replace('_', ' ').title(), fontsize=12)
+            ax.set_title(title, fontsize=16, weight='bold')
+            fig.tight_layout()
+
+            buf = io.BytesIO()
+            # Light compression: the chart is shown once and discarded,
+            # and zlib level 1 is ~5x faster than the default level 6
+            fig.savefig(buf, format='png', dpi=90, pil_kwargs={'compress_level': 1})
+            buf.seek(0)
+
         logging.info("Bar chart created successfully.")
         return buf.getvalue()
 
-    def create_scatter_plot(self, data_string: str, x_col: str, y_col: str, title: str) -> bytes | str:
+    def create_scatter_plot(self, data: list | str, x_col: str, y_col: str, title: str) -> bytes | str:
         """
         Creates a scatter plot from data.
         Use this to visualize the relationship between two different numerical columns (e.g., avg_lifespan_change vs. max_lifespan_change).
         Args:
-            data_string (str): A string that looks like a Python list of tuples, e.g., "[(10, 12), (15, 18)]".
+            data (list | str): A list of row tuples, e.g., [(10, 12), (15, 18)], or the same data serialized as JSON.
             x_col (str): The name for the x-axis data.
             y_col (str): The name for the y-axis data.
             title (str): The title for the chart.
@@ -85,7 +116,7 @@ class PlottingTools:
             bytes: The PNG image data of the chart as bytes, or an error string.
         """
         logging.info(f"Attempting to create scatter plot with title: {title}")
-        df = self._prepare_data(data_string)
+        df = self._prepare_data(data)
         if df is None:
             return "Error: Data for plotting was in an invalid format."
 
@@ -93,19 +124,18 @@ class PlottingTools:
         df[x_col] = pd.to_numeric(df[x_col], errors='coerce').fillna(0)
         df[y_col] = pd.to_numeric(df[y_col], errors='coerce').fillna(0)
 
-        plt.style.use('seaborn-v0_8-darkgrid')
-        fig, ax = plt.subplots(figsize=(8, 8))
-        ax.scatter(df[x_col], df[y_col], alpha=0.7, color='#50E3C2')
+        with self._LOCK:
+            fig, ax = self._get_axes(figsize=(8, 8))
+            ax.scatter(df[x_col], df[y_col], alpha=0.7, color='#50E3C2')
 
-        ax.set_xlabel(x_col.replace('_', ' ').title(), fontsize=12)
-        ax.set_ylabel(y_col.replace('_', ' ').title(), fontsize=12)
-        ax.set_title(title, fontsize=16, weight='bold')
-        plt.tight_layout()
+            ax.set_xlabel(x_col.replace('_', ' ').title(), fontsize=12)
+            ax.set_ylabel(y_col.replace('_', ' ').title(), fontsize=12)
+            ax.set_title(title, fontsize=16, weight='bold')
+            fig.tight_layout()
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', dpi=90, pil_kwargs={'compress_level': 1})
+            buf.seek(0)
 
         logging.info("Scatter plot created successfully.")
         return buf.getvalue()
@@ -1,14 +1,19 @@
 import pandas as pd
 from sqlalchemy import create_engine, text
+import json
 import os
-import requests 
-import zipfile   
-import io        
+import requests
+import zipfile
+import io
 
 # --- Configuration ---
 CSV_URL = "https://genomics.senescence.info/drugs/dataset.zip"
 DB_NAME = "drugage.sqlite"
+PARQUET_NAME = "drugage.parquet"
 TABLE_NAME = "drug_data"
+DISTINCT_CACHE_NAME = "distinct_cache.json"
+# 聊天机器人按这两个低基数列做筛选，提前建索引 + 预存唯一值
+INDEXED_COLUMNS = ("species", "value_type")
 
 def prepare_database():
     """
@@ -28,23 +33,25 @@ def prepare_database():
         # --- 2. Download and Load the Data using Pandas ---
         print(f"Downloading data from {CSV_URL}...")
         
-        # Make an HTTP request to get the content of the ZIP file
-        response = requests.get(CSV_URL)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        # Stream the ZIP into a single in-memory buffer: downloading chunk by
+        # chunk avoids buffering the whole body in requests and copying it again
+        zip_file = io.BytesIO()
+        with requests.get(CSV_URL, stream=True) as response:
+            response.raise_for_status()  # Raise an exception for bad status codes
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                zip_file.write(chunk)
+        zip_file.seek(0)
 
-        # Use BytesIO to treat the ZIP file content as a file in memory
-        zip_file = io.BytesIO(response.content)
-
-        # Use zipfile to open the archive and read the specific CSV file
+        # Read the CSV straight from the archive member with the C parser
         with zipfile.ZipFile(zip_file) as z:
             with z.open('drugage.csv') as f:
-                df = pd.read_csv(f)
+                df = pd.read_csv(f, engine='c')
 
         print("Data downloaded successfully.")
 
         # --- 3. Clean and Standardize the Data ---
         print("Cleaning and standardizing data...")
-        df.columns = [col.lower().replace(' ', '_') for col in df.columns]
+        df.columns = df.columns.str.lower().str.replace(' ', '_', regex=False)
         print(f"Found {len(df)} records.")
         
         # --- 4. Create SQLite Database and Load Data ---
@@ -53,6 +60,32 @@ def prepare_database():
         df.to_sql(TABLE_NAME, engine, if_exists='replace', index=False)
         print(f"Data successfully loaded into '{TABLE_NAME}' table.")
 
+        # --- 4a. Dump a columnar copy for the app's in-memory engine ---
+        # The chatbot can register this Parquet file with DuckDB and skip
+        # SQLite's disk I/O and per-query planning entirely
+        df.to_parquet(PARQUET_NAME, compression='zstd')
+        print(f"Columnar copy written to '{PARQUET_NAME}'.")
+
+        # --- 4b. Index the low-cardinality filter columns ---
+        # SELECT DISTINCT can then use an index skip-scan instead of a full table scan
+        print("Creating indexes on filter columns...")
+        with engine.connect() as connection:
+            for col in INDEXED_COLUMNS:
+                if col in df.columns:
+                    connection.execute(text(f"CREATE INDEX idx_{col} ON {TABLE_NAME}({col})"))
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+        # --- 4c. Write a sidecar with the distinct values ---
+        # The app can read this at startup and skip the database entirely
+        distinct_cache = {
+            col: sorted(df[col].dropna().unique().tolist())
+            for col in INDEXED_COLUMNS if col in df.columns
+        }
+        with open(DISTINCT_CACHE_NAME, 'w') as f:
+            json.dump(distinct_cache, f, indent=2)
+        print(f"Distinct values cached in '{DISTINCT_CACHE_NAME}'.")
+
         # --- 5. Verify the Data (Optional) ---
         print("Verifying data load...")
         with engine.connect() as connection: